@@ -2,123 +2,184 @@
 
 import logging
 import re
-from typing import List, Dict, Any
-import numpy as np
-from sklearn.cluster import KMeans
+from dataclasses import dataclass
+from functools import lru_cache
+from operator import itemgetter
+from typing import List, Dict, Any, Iterable, Iterator, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+    from pdf_processor import Block
 
 logger = logging.getLogger(__name__)
 
+@dataclass(slots=True)
+class Feature:
+    """
+    Classification features computed for a single text block.
+    """
+    text: str
+    font_size: float
+    is_bold: bool
+    is_all_caps: bool
+    starts_with_number: bool
+    is_centered: bool
+    word_count: int
+    is_toc: bool
+    original_block: 'Block'
+
+@lru_cache(maxsize=None)
+def _is_bold_font(font_name: str) -> bool:
+    """Checks a font name for bold weights; cached since a document uses only a few fonts."""
+    font_name = font_name.lower()
+    return "bold" in font_name or "black" in font_name
+
 class HierarchyBuilder:
     """
     Builds a hierarchical outline (Title, H1, H2, H3) from processed PDF data.
     """
 
-    def _is_header_or_footer(self, block: Dict, page_height: float) -> bool:
-        """Checks if a text block is likely a header or footer."""
-        y_pos = block['bbox'][1]
+    # Precompiled patterns used on every block
+    _TOC_RE = re.compile(r'\.{4,}\s*\d+\s*$')        # e.g. "......... 5"
+    _NUM_PREFIX_RE = re.compile(r'^\d+(\.\d+)*\s+')  # e.g. "2.1 "
+
+    def _content_zone(self, page_height: float) -> Tuple[float, float]:
+        """Returns the (top, bottom) y-limits outside of which blocks are headers or footers."""
         # Considers top 8% and bottom 8% of the page as header/footer zones
-        return y_pos < page_height * 0.08 or y_pos > page_height * 0.92
+        return page_height * 0.08, page_height * 0.92
+
+    def _core_blocks(self, page: Dict) -> Iterator['Block']:
+        """Yields the page's text blocks that lie outside its header and footer zones."""
+        # Header/footer limits depend only on the page, so compute them once per page
+        zone_top, zone_bottom = self._content_zone(page.get('height', 842)) # Default A4 height
+        for block in page.get('text_blocks', []):
+            if zone_top <= block.bbox[1] <= zone_bottom:
+                yield block
 
     def _is_toc_entry(self, text: str) -> bool:
         """Checks if text is likely a table of contents entry."""
-        # Looks for patterns like "......... 5"
-        return bool(re.search(r'\.{4,}\s*\d+\s*$', text))
+        return bool(self._TOC_RE.search(text))
 
-    def _get_block_features(self, block: Dict, page_width: float) -> Dict:
+    def _get_block_features(self, block: 'Block', page_width: float) -> Feature:
         """Extracts key features from a text block for classification."""
-        text = block['text'].strip()
-        x0, _, x1, _ = block['bbox']
-        word_count = len(text.split())
-
-        return {
-            "text": text,
-            "font_size": block.get('font_size', 0),
-            "is_bold": "bold" in block.get('font_name', '').lower() or "black" in block.get('font_name', '').lower(),
-            "is_all_caps": text.isupper() and word_count > 0,
-            "starts_with_number": bool(re.match(r'^\d+(\.\d+)*\s+', text)),
-            "is_centered": abs(((x0 + x1) / 2) - (page_width / 2)) < (page_width * 0.15), # 15% tolerance for centering
-            "word_count": word_count,
-            "is_toc": self._is_toc_entry(text),
-            "original_block": block
-        }
-
-    def _is_potential_heading(self, features: Dict) -> bool:
-        """Determines if a block is a potential heading based on its features."""
-        # Basic disqualifiers
-        if not features['text'] or features['word_count'] > 20 or features['is_toc'] or features['text'].isdigit():
-            return False
-        
+        text = block.text.strip()
+        x0, _, x1, _ = block.bbox
+        word_count = block.word_count
+
+        return Feature(
+            text=text,
+            font_size=block.font_size,
+            is_bold=_is_bold_font(block.font_name),
+            is_all_caps=text.isupper() and word_count > 0,
+            starts_with_number=bool(self._NUM_PREFIX_RE.match(text)),
+            is_centered=abs(((x0 + x1) / 2) - (page_width / 2)) < (page_width * 0.15), # 15% tolerance for centering
+            word_count=word_count,
+            is_toc=self._is_toc_entry(text),
+            original_block=block
+        )
+
+    def _quick_disqualify(self, text: str, word_count: int) -> bool:
+        """Cheap checks on stripped block text that rule it out as a heading before features are computed."""
+        return not text or word_count > 20 or text.isdigit() or self._is_toc_entry(text)
+
+    def _is_potential_heading(self, features: Feature) -> bool:
+        """
+        Determines if a block is a potential heading based on its features.
+        Expects blocks already rejected by `_quick_disqualify` to be skipped.
+        """
         # Strong indicators of a heading
-        if features['font_size'] > 14 and features['word_count'] < 15:
+        if features.font_size > 14 and features.word_count < 15:
             return True
-        if features['starts_with_number'] and features['word_count'] < 15:
+        if features.starts_with_number and features.word_count < 15:
             return True
-        if features['is_bold'] and features['word_count'] < 15:
+        if features.is_bold and features.word_count < 15:
             return True
-        if features['is_all_caps'] and features['font_size'] > 11 and features['word_count'] < 15:
+        if features.is_all_caps and features.font_size > 11 and features.word_count < 15:
             return True
 
         return False
 
-    def _extract_title(self, text_blocks: List[Dict], page_width: float) -> str:
+    def _extract_title(self, first_page_blocks: Iterable['Block'], page_width: float) -> str:
         """Extracts the document title, focusing on the top of the first page."""
-        first_page_blocks = [b for b in text_blocks if b.get('page_num', 1) == 1 and b['text'].strip()]
-        
-        if not first_page_blocks:
-            return "Untitled Document"
-
         candidates = []
         for block in first_page_blocks:
             # Only consider blocks in the top 40% of the first page
-            if block['bbox'][1] > 400: continue
+            if block.bbox[1] > 400: continue
 
             features = self._get_block_features(block, page_width)
-            if not features['text'] or features['word_count'] > 25: continue
+            if not features.text or features.word_count > 25: continue
             
             # Score candidates based on font size and centeredness
-            score = features['font_size']
-            if features['is_centered']:
+            score = features.font_size
+            if features.is_centered:
                 score *= 1.5
-            if features['is_bold']:
+            if features.is_bold:
                 score *= 1.2
             
-            candidates.append((score, features['text']))
+            candidates.append((score, features.text))
 
         return max(candidates, key=lambda item: item[0])[1] if candidates else "Untitled Document"
 
-    def _assign_heading_levels(self, heading_candidates: List[Dict]) -> List[Dict]:
-        """Assigns H1, H2, H3 levels using KMeans clustering on font sizes."""
+    def _natural_breaks(self, sizes: 'np.ndarray', counts: 'np.ndarray') -> 'np.ndarray':
+        """
+        Splits sorted unique font sizes into 3 contiguous groups with the lowest
+        count-weighted within-group variance (an exact 1-D k-means) and returns
+        the two lower bounds of the upper groups.
+        """
+        import numpy as np
+
+        # Prefix sums with a leading zero so any segment [i, j) costs O(1)
+        w = np.concatenate(([0], np.cumsum(counts)))
+        s1 = np.concatenate(([0.0], np.cumsum(counts * sizes)))
+        s2 = np.concatenate(([0.0], np.cumsum(counts * sizes ** 2)))
+
+        def sse(i, j):
+            return s2[j] - s2[i] - (s1[j] - s1[i]) ** 2 / (w[j] - w[i])
+
+        # Try every pair of cut points a < b; segments are [0, a), [a, b), [b, n)
+        n = len(sizes)
+        a, b = np.triu_indices(n - 1, k=1)
+        a, b = a + 1, b + 1
+        cost = sse(0, a) + sse(a, b) + sse(b, n)
+        best = np.argmin(cost)
+        return sizes[[a[best], b[best]]]
+
+    def _assign_heading_levels(self, heading_candidates: List[Feature]) -> List[Dict]:
+        """Assigns H1, H2, H3 levels by clustering font sizes into natural breaks."""
         if not heading_candidates:
             return []
 
         if len(heading_candidates) == 1:
-            block = heading_candidates[0]['original_block']
-            return [{"level": 'H1', "text": heading_candidates[0]['text'], "page": block['page_num']}]
+            block = heading_candidates[0].original_block
+            return [{"level": 'H1', "text": heading_candidates[0].text, "page": block.page_num}]
+
+        # Deferred so documents with zero or one heading never pay numpy's import cost
+        import numpy as np
 
-        font_sizes = np.array([[h['font_size']] for h in heading_candidates])
-        unique_sizes = np.unique(font_sizes)
+        font_sizes = np.array([h.font_size for h in heading_candidates], dtype=float)
+        unique_sizes, counts = np.unique(font_sizes, return_counts=True)
         
-        # Cluster into at most 3 levels (H1, H2, H3)
-        n_clusters = min(len(unique_sizes), 3)
-        if n_clusters == 0: return []
+        # Group into at most 3 levels (H1, H2, H3)
+        n_levels = min(len(unique_sizes), 3)
+        if n_levels == 0: return []
+
+        if len(unique_sizes) <= 3:
+            # Few enough distinct sizes to give each one its own level
+            thresholds = unique_sizes[1:]
+        else:
+            thresholds = self._natural_breaks(unique_sizes, counts)
 
-        kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init='auto').fit(font_sizes)
         # Map larger font sizes to higher heading levels
-        cluster_centers = sorted(kmeans.cluster_centers_.flatten(), reverse=True)
-        size_to_level = {center: f"H{i+1}" for i, center in enumerate(cluster_centers)}
+        levels = n_levels - np.searchsorted(thresholds, font_sizes, side='right')
         
         outline = []
-        for i, features in enumerate(heading_candidates):
-            cluster_label = kmeans.labels_[i]
-            cluster_center = kmeans.cluster_centers_[cluster_label][0]
-            level = size_to_level.get(cluster_center, f'H{n_clusters}') # Default to lowest level
-            
-            block = features['original_block']
+        for features, level in zip(heading_candidates, levels.tolist()):
+            block = features.original_block
             outline.append({
-                "level": level,
-                "text": features['text'],
-                "page": block['page_num'],
-                "y_pos": block['bbox'][1] # Keep for sorting
+                "level": f"H{level}",
+                "text": features.text,
+                "page": block.page_num,
+                "y_pos": block.bbox[1] # Keep for sorting
             })
         return outline
 
@@ -127,24 +188,34 @@ class HierarchyBuilder:
         if not processed_pages:
             return {"title": "No Content Found", "outline": []}
 
-        all_blocks = [block for page in processed_pages for block in page.get('text_blocks', [])]
-        page_height = processed_pages[0].get('height', 842) # Default A4 height
         page_width = processed_pages[0].get('width', 595)   # Default A4 width
-        
-        # Filter out headers and footers to create a clean list of content blocks
-        core_content_blocks = [b for b in all_blocks if not self._is_header_or_footer(b, page_height)]
-        
-        title = self._extract_title(core_content_blocks, page_width)
-        
-        # Identify potential headings from the core content
-        block_features = [self._get_block_features(b, page_width) for b in core_content_blocks]
-        heading_candidates = [f for f in block_features if self._is_potential_heading(f)]
-        # Ensure the title itself is not also listed as a heading
-        heading_candidates = [h for h in heading_candidates if h['text'] != title]
+
+        # The title only ever comes from the first page's core content
+        title = self._extract_title(self._core_blocks(processed_pages[0]), page_width)
+
+        # Bound once here rather than looked up for every block
+        core_blocks = self._core_blocks
+        quick_disqualify = self._quick_disqualify
+        get_block_features = self._get_block_features
+        is_potential_heading = self._is_potential_heading
+
+        # Single streamed pass over the core content (headers and footers skipped);
+        # only the potential headings are kept
+        heading_candidates = []
+        for page in processed_pages:
+            for block in core_blocks(page):
+                # Most blocks are body text; reject them before paying for feature extraction
+                if quick_disqualify(block.text.strip(), block.word_count):
+                    continue
+
+                features = get_block_features(block, page_width)
+                # Ensure the title itself is not also listed as a heading
+                if is_potential_heading(features) and features.text != title:
+                    heading_candidates.append(features)
         
         # Assign levels and sort the final outline
         outline = self._assign_heading_levels(heading_candidates)
-        outline.sort(key=lambda x: (x['page'], x['y_pos']))
+        outline.sort(key=itemgetter('page', 'y_pos'))
         
         # Clean up temporary keys before returning
         for item in outline:
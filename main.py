@@ -1,10 +1,12 @@
 # main.py
 
-import json
+import os
 import time
 import logging
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+import orjson
 from pdf_processor import PDFProcessor
 from hierarchy_builder import HierarchyBuilder
 
@@ -12,7 +14,11 @@ from hierarchy_builder import HierarchyBuilder
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s", stream=sys.stdout)
 logger = logging.getLogger(__name__)
 
-def process_single_pdf(pdf_path: Path, output_path: Path) -> bool:
+# The core components are stateless, so each (worker) process builds them once and reuses them
+_PROCESSOR = PDFProcessor()
+_BUILDER = HierarchyBuilder()
+
+def process_single_pdf(pdf_path: Path, output_path: Path, processor: PDFProcessor = _PROCESSOR, builder: HierarchyBuilder = _BUILDER) -> bool:
     """
     Processes a single PDF file to extract its title and hierarchical outline.
     """
@@ -20,10 +26,6 @@ def process_single_pdf(pdf_path: Path, output_path: Path) -> bool:
     start_time = time.time()
     
     try:
-        # Initialize the core components
-        processor = PDFProcessor()
-        builder = HierarchyBuilder()
-        
         # Step 1: Use PDFProcessor to extract structured data from the PDF.
         processed_pages = processor.process_pdf(str(pdf_path))
         if not processed_pages:
@@ -33,9 +35,8 @@ def process_single_pdf(pdf_path: Path, output_path: Path) -> bool:
         # Step 2: Use HierarchyBuilder to analyze the data and build the final outline.
         result = builder.build(processed_pages)
         
-        # Step 3: Save the resulting dictionary as a JSON file.
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(result, f, indent=4, ensure_ascii=False)
+        # Step 3: Save the resulting dictionary as a JSON file (orjson writes UTF-8 natively).
+        output_path.write_bytes(orjson.dumps(result, option=orjson.OPT_INDENT_2))
             
         processing_time = time.time() - start_time
         logger.info(f"Successfully processed {pdf_path.name} in {processing_time:.2f} seconds.")
@@ -59,10 +60,11 @@ def main():
     pdf_files = list(input_dir.glob("*.pdf"))
     logger.info(f"Found {len(pdf_files)} PDF(s) to process in '{input_dir}'.")
     
-    # Process each PDF file found in the input directory
-    for pdf_file in pdf_files:
-        output_file = output_dir / f"{pdf_file.stem}.json"
-        process_single_pdf(pdf_file, output_file)
+    # Each PDF is independent, so process them in parallel across all CPU cores
+    output_files = [output_dir / f"{pdf_file.stem}.json" for pdf_file in pdf_files]
+    if pdf_files:
+        with ProcessPoolExecutor(max_workers=min(len(pdf_files), os.cpu_count() or 1)) as executor:
+            list(executor.map(process_single_pdf, pdf_files, output_files))
             
     logger.info("--- All processing complete ---")
 
@@ -1,16 +1,41 @@
 # pdf_processor.py
 
+import ctypes
 import logging
-import pdfplumber
+import math
+import sys
+from dataclasses import dataclass
+import numpy as np
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
 from typing import List, Dict, Any, Tuple
 
 logger = logging.getLogger(__name__)
 
+@dataclass(slots=True)
+class Block:
+    """
+    A logical text block (line or paragraph) extracted from a PDF page.
+    """
+    text: str
+    word_count: int
+    bbox: Tuple[float, float, float, float]
+    font_name: str
+    font_size: float
+    page_num: int
+
 class PDFProcessor:
     """
     Processes a PDF to extract text elements and their properties.
     """
 
+    # Word segmentation tolerances (in points), as previously passed to pdfplumber
+    _X_TOLERANCE = 1.5
+    _Y_TOLERANCE = 3
+
+    # Ligatures expanded into plain letters, matching pdfplumber's default behaviour
+    _LIGATURES = {"ﬀ": "ff", "ﬃ": "ffi", "ﬄ": "ffl", "ﬁ": "fi", "ﬂ": "fl", "ﬆ": "st", "ﬅ": "st"}
+
     def process_pdf(self, pdf_path: str) -> List[Dict[str, Any]]:
         """
         Extracts structured text data from each page of a PDF.
@@ -18,29 +43,30 @@ class PDFProcessor:
         pages_data = []
         
         try:
-            # Using pdfplumber to open and parse the PDF
-            with pdfplumber.open(pdf_path) as pdf:
-                for i, page in enumerate(pdf.pages):
+            # Using PDFium (via pypdfium2) to open and parse the PDF. Pages are processed
+            # sequentially: PDFium is not thread-safe, so its calls cannot be spread over
+            # threads, and parallelism comes from running one PDF per process in main.py.
+            with pdfium.PdfDocument(pdf_path) as pdf:
+                for i in range(len(pdf)):
                     page_num = i + 1
                     logger.info(f"Processing Page {page_num}...")
-                    
+
+                    page = pdf[i]
+                    textpage = page.get_textpage()
+                    left, bottom, right, top = page.get_bbox()
+
                     # Extract words with detailed attributes for robust analysis
-                    words = page.extract_words(
-                        x_tolerance=1.5,
-                        y_tolerance=3,
-                        keep_blank_chars=False,
-                        use_text_flow=True,
-                        horizontal_ltr=True,
-                        extra_attrs=["fontname", "size"]
-                    )
+                    words = self._extract_words(textpage, left, top)
+                    textpage.close()
+                    page.close()
                     
                     # Group individual words into logical text blocks (lines/paragraphs)
                     text_blocks = self._group_words_into_blocks(words, page_num)
                     
                     pages_data.append({
                         'page_num': page_num,
-                        'width': float(page.width),
-                        'height': float(page.height),
+                        'width': float(right - left),
+                        'height': float(top - bottom),
                         'text_blocks': text_blocks,
                     })
             
@@ -50,77 +76,144 @@ class PDFProcessor:
             logger.error(f"Failed to process PDF '{pdf_path}'. Error: {e}", exc_info=True)
             return []
 
-    def _unify_bbox(self, bboxes: List[Tuple]) -> Tuple[float, float, float, float]:
-        """Calculates a single bounding box that encompasses all given boxes."""
-        if not bboxes:
-            return (0, 0, 0, 0)
-        x0 = min(b[0] for b in bboxes)
-        y0 = min(b[1] for b in bboxes)
-        x1 = max(b[2] for b in bboxes)
-        y1 = max(b[3] for b in bboxes)
-        return (x0, y0, x1, y1)
-
-    def _group_words_into_blocks(self, words: List[Dict], page_num: int) -> List[Dict]:
+    def _extract_words(self, textpage: pdfium.PdfTextPage, page_left: float, page_top: float) -> List[Dict[str, Any]]:
+        """
+        Merges the characters of a page into words with the same keys and
+        splitting rules as pdfplumber's `extract_words` (text flow order,
+        split on whitespace, font changes and position jumps). Coordinates
+        are converted to pdfplumber's top-left origin.
+        """
+        raw = textpage.raw
+        rect = pdfium_c.FS_RECTF()
+        matrix = pdfium_c.FS_MATRIX()
+        name_buf = ctypes.create_string_buffer(256)
+        flags = ctypes.c_int()
+
+        # Single scan over the page's characters, collecting one column per attribute
+        texts, x0s, x1s, bottoms, sizes, fontnames, after_space = [], [], [], [], [], [], []
+        space_before = True
+        for i in range(textpage.count_chars()):
+            # Spaces and line breaks synthesized by PDFium are not in the content stream
+            if pdfium_c.FPDFText_IsGenerated(raw, i) == 1:
+                continue
+
+            text = chr(pdfium_c.FPDFText_GetUnicode(raw, i))
+            if text.isspace():
+                space_before = True
+                continue
+
+            pdfium_c.FPDFText_GetLooseCharBox(raw, i, rect)
+            pdfium_c.FPDFText_GetMatrix(raw, i, matrix)
+            pdfium_c.FPDFText_GetFontInfo(raw, i, name_buf, len(name_buf), flags)
+            # The reported font size excludes the text matrix, so scale it to the rendered size
+            sizes.append(pdfium_c.FPDFText_GetFontSize(raw, i) * math.hypot(matrix.c, matrix.d))
+            # Interned so the many repeats of a font name share one object and compare by identity
+            fontnames.append(sys.intern(name_buf.value.decode('utf-8', 'replace')))
+            texts.append(self._LIGATURES.get(text, text))
+            x0s.append(rect.left)
+            x1s.append(rect.right)
+            bottoms.append(rect.bottom)
+            after_space.append(space_before)
+            space_before = False
+
+        if not texts:
+            return []
+
+        size = np.array(sizes)
+        x0 = np.array(x0s) - page_left
+        x1 = np.array(x1s) - page_left
+        bottom = page_top - np.array(bottoms)
+        top = bottom - size
+        fontname = np.array(fontnames, dtype=object)
+
+        # A character starts a new word after whitespace, on a font change, or when it
+        # jumps backwards, too far right, or down to another line
+        word_break = np.array(after_space)
+        word_break[1:] |= (
+            (fontname[1:] != fontname[:-1])
+            | (size[1:] != size[:-1])
+            | (x0[1:] < x0[:-1])
+            | (x0[1:] > x1[:-1] + self._X_TOLERANCE)
+            | (top[1:] > top[:-1] + self._Y_TOLERANCE)
+        )
+        starts = np.flatnonzero(word_break)
+        ends = np.append(starts[1:], len(texts)).tolist()
+
+        word_x0 = np.minimum.reduceat(x0, starts).tolist()
+        word_top = np.minimum.reduceat(top, starts).tolist()
+        word_x1 = np.maximum.reduceat(x1, starts).tolist()
+        word_bottom = np.maximum.reduceat(bottom, starts).tolist()
+        starts = starts.tolist()
+
+        return [
+            {
+                "text": "".join(texts[start:end]),
+                "x0": word_x0[k],
+                "top": word_top[k],
+                "x1": word_x1[k],
+                "bottom": word_bottom[k],
+                "fontname": fontnames[start],
+                "size": sizes[start],
+            }
+            for k, (start, end) in enumerate(zip(starts, ends))
+        ]
+
+    def _make_block(self, block_words: List[Dict], page_num: int) -> Block:
+        """
+        Builds a text block from its ordered words, joining the text and
+        unifying the word bounding boxes in a single pass.
+        """
+        first = block_words[0]
+        x0, y0, x1, y1 = first['x0'], first['top'], first['x1'], first['bottom']
+        text_parts = []
+        for w in block_words:
+            text_parts.append(w['text'])
+            if w['x0'] < x0: x0 = w['x0']
+            if w['top'] < y0: y0 = w['top']
+            if w['x1'] > x1: x1 = w['x1']
+            if w['bottom'] > y1: y1 = w['bottom']
+
+        return Block(
+            text=" ".join(text_parts),
+            word_count=len(text_parts), # Words never contain whitespace, so this equals len(text.split())
+            bbox=(x0, y0, x1, y1),
+            font_name=first['fontname'],
+            font_size=round(first['size'], 2),
+            page_num=page_num
+        )
+
+    def _group_words_into_blocks(self, words: List[Dict], page_num: int) -> List[Block]:
         """
         Groups individual words into logical text blocks using a heuristic approach.
         """
         if not words:
             return []
         
-        # Group words into lines based on vertical position
-        lines = []
-        if words:
-            sorted_words = sorted(words, key=lambda w: (w['top'], w['x0']))
-            current_line = [sorted_words[0]]
-            for word in sorted_words[1:]:
-                if abs(word['top'] - current_line[-1]['top']) < 2: # Tolerance for same-line words
-                    current_line.append(word)
-                else:
-                    lines.append(sorted(current_line, key=lambda w: w['x0']))
-                    current_line = [word]
-            lines.append(sorted(current_line, key=lambda w: w['x0']))
-
-        # Group lines into blocks based on font properties and spacing
-        blocks = []
-        if lines:
-            current_block_lines = [lines[0]]
-            for line in lines[1:]:
-                prev_line = current_block_lines[-1]
-                
-                vertical_gap = line[0]['top'] - prev_line[0]['top']
-                font_name_match = line[0]['fontname'] == prev_line[0]['fontname']
-                font_size_match = abs(line[0]['size'] - prev_line[0]['size']) < 1
-
-                # A new block starts if there's a large vertical gap or font properties change
-                is_new_block = (vertical_gap > prev_line[0]['size'] * 1.6) or not font_name_match or not font_size_match
-
-                if is_new_block:
-                    text = " ".join(" ".join(w['text'] for w in ln) for ln in current_block_lines)
-                    all_words_in_block = [w for ln in current_block_lines for w in ln]
-                    bboxes = [(w['x0'], w['top'], w['x1'], w['bottom']) for w in all_words_in_block]
-                    
-                    blocks.append({
-                        "text": text,
-                        "bbox": self._unify_bbox(bboxes),
-                        "font_name": all_words_in_block[0]['fontname'],
-                        "font_size": round(all_words_in_block[0]['size'], 2),
-                        "page_num": page_num
-                    })
-                    current_block_lines = [line]
-                else:
-                    current_block_lines.append(line)
-
-            # Append the last remaining block
-            text = " ".join(" ".join(w['text'] for w in ln) for ln in current_block_lines)
-            all_words_in_block = [w for ln in current_block_lines for w in ln]
-            bboxes = [(w['x0'], w['top'], w['x1'], w['bottom']) for w in all_words_in_block]
-            
-            blocks.append({
-                "text": text,
-                "bbox": self._unify_bbox(bboxes),
-                "font_name": all_words_in_block[0]['fontname'],
-                "font_size": round(all_words_in_block[0]['size'], 2),
-                "page_num": page_num
-            })
-
-        return blocks
\ No newline at end of file
+        # Group words into lines based on vertical position, after sorting by (top, x0)
+        tops = np.array([w['top'] for w in words])
+        x0s = np.array([w['x0'] for w in words])
+        order = np.lexsort((x0s, tops))
+        line_break = np.diff(tops[order]) >= 2 # Tolerance for same-line words
+        line_ids = np.concatenate(([0], np.cumsum(line_break)))
+        line_starts = np.concatenate(([0], np.flatnonzero(line_break) + 1))
+
+        # Order each line left to right (lexsort is stable, so ties keep their top order)
+        order = order[np.lexsort((x0s[order], line_ids))]
+        ordered_words = [words[i] for i in order]
+
+        # Group lines into blocks based on font properties and spacing of each line's first word
+        first_words = [ordered_words[i] for i in line_starts]
+        line_top = np.array([w['top'] for w in first_words])
+        line_size = np.array([w['size'] for w in first_words])
+        line_font = np.array([w['fontname'] for w in first_words], dtype=object)
+
+        vertical_gap = np.diff(line_top)
+        font_change = line_font[1:] != line_font[:-1]
+        size_change = np.abs(np.diff(line_size)) >= 1
+
+        # A new block starts if there's a large vertical gap or font properties change
+        block_break = (vertical_gap > line_size[:-1] * 1.6) | font_change | size_change
+        block_starts = line_starts[np.concatenate(([0], np.flatnonzero(block_break) + 1))].tolist()
+
+        ends = block_starts[1:] + [len(ordered_words)]
+        return [self._make_block(ordered_words[start:end], page_num) for start, end in zip(block_starts, ends)]
\ No newline at end of file